@@ -1,9 +1,13 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import folium
 import leafmap.foliumap as leafmap
+import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
-import pandas as pd
+import numpy as np
 
 # ---------------------------------------------------------
 # CONFIGURATION & STYLING
@@ -11,11 +15,10 @@ import pandas as pd
 st.set_page_config(page_title="Southwest Road Trip", page_icon="🌵", layout="wide")
 
 # Notion-like custom CSS for cleaner look
-st.markdown("""
+# Page background and text color come from the theme in .streamlit/config.toml
+CUSTOM_CSS = """
 <style>
     .stApp {
-        background-color: #FFFFFF;
-        color: #37352F;
         font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Helvetica, "Apple Color Emoji", Arial, sans-serif, "Segoe UI Emoji", "Segoe UI Symbol";
     }
     h1, h2, h3 {
@@ -39,162 +42,385 @@ st.markdown("""
         border-radius: 8px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # ---------------------------------------------------------
 # DATA: LOCATIONS & COORDINATES
 # ---------------------------------------------------------
+# name -> (lat, lon, type)
 LOCATIONS = {
-    "Phoenix Airport": {"coords": [33.4352, -112.0101], "type": "start"},
-    "Phoenix Downtown": {"coords": [33.4484, -112.0740], "type": "stop"},
-    "Route 93": {"coords": [34.7000, -113.3000], "type": "waypoint"}, # Approximate
-    "Henderson": {"coords": [36.0395, -114.9817], "type": "stop"},
-    "Hoover Dam": {"coords": [36.0160, -114.7377], "type": "highlight"},
-    "Bypass Bridge": {"coords": [36.0145, -114.7390], "type": "waypoint"},
-    "Arizona Scenic Overlook": {"coords": [36.0095, -114.7350], "type": "waypoint"}, # Near bridge
-    "Joshua Tree Forest": {"coords": [35.8500, -114.1500], "type": "highlight"}, # Diamond Bar Rd
-    "Las Vegas Strip": {"coords": [36.1147, -115.1728], "type": "stop"},
-    "Grand Canyon West": {"coords": [35.9897, -113.8214], "type": "highlight"},
-    "Grand Canyon South": {"coords": [36.0544, -112.1401], "type": "highlight"},
-    "Flagstaff": {"coords": [35.1983, -111.6513], "type": "stop"},
-    "Sedona": {"coords": [34.8697, -111.7610], "type": "stop"},
-    "Cathedral Rock": {"coords": [34.8189, -111.7925], "type": "highlight"},
-    "Chapel of Holy Cross": {"coords": [34.8322, -111.7663], "type": "highlight"},
-    "Bell Rock": {"coords": [34.8016, -111.7613], "type": "highlight"},
-    "St. Thomas Orthodox Church": {"coords": [33.4660, -112.0310], "type": "highlight"}, # Approx near 2317 E Yale St
+    "Phoenix Airport": (33.4352, -112.0101, "start"),
+    "Phoenix Downtown": (33.4484, -112.0740, "stop"),
+    "Route 93": (34.7000, -113.3000, "waypoint"), # Approximate
+    "Henderson": (36.0395, -114.9817, "stop"),
+    "Hoover Dam": (36.0160, -114.7377, "highlight"),
+    "Bypass Bridge": (36.0145, -114.7390, "waypoint"),
+    "Arizona Scenic Overlook": (36.0095, -114.7350, "waypoint"), # Near bridge
+    "Joshua Tree Forest": (35.8500, -114.1500, "highlight"), # Diamond Bar Rd
+    "Las Vegas Strip": (36.1147, -115.1728, "stop"),
+    "Grand Canyon West": (35.9897, -113.8214, "highlight"),
+    "Grand Canyon South": (36.0544, -112.1401, "highlight"),
+    "Flagstaff": (35.1983, -111.6513, "stop"),
+    "Sedona": (34.8697, -111.7610, "stop"),
+    "Cathedral Rock": (34.8189, -111.7925, "highlight"),
+    "Chapel of Holy Cross": (34.8322, -111.7663, "highlight"),
+    "Bell Rock": (34.8016, -111.7613, "highlight"),
+    "St. Thomas Orthodox Church": (33.4660, -112.0310, "highlight"), # Approx near 2317 E Yale St
 }
 
+# Marker color based on location type (anything else is drawn like a waypoint)
+MARKER_COLORS = {"start": "green", "stop": "blue", "highlight": "red", "waypoint": "gray"}
+# Complete CircleMarker style per type, built once instead of per marker
+MARKER_STYLES = {
+    point_type: {"radius": 7, "color": color, "fill": True, "fill_opacity": 0.9}
+    for point_type, color in MARKER_COLORS.items()
+}
+
+# Parallel-array (SoA) view of LOCATIONS, built once for route lookups
+LOCATION_NAMES = list(LOCATIONS)
+LOCATION_INDEX = {name: i for i, name in enumerate(LOCATION_NAMES)}
+LOCATION_COORDS = np.array([(lat, lon) for lat, lon, _ in LOCATIONS.values()]) # float64[N, 2]
+LOCATION_TYPES = [point_type for _, _, point_type in LOCATIONS.values()]
+
+# Route segments, one per day, in trip order
+ROUTES = (
+    {
+        "name": "Day 1: PHX to Vegas",
+        "color": "#E91E63", # Pink
+        "points": ("Phoenix Airport", "Route 93", "Henderson", "Hoover Dam", "Las Vegas Strip")
+    },
+    {
+        "name": "Day 2: Vegas to Flagstaff",
+        "color": "#9C27B0", # Purple
+        "points": ("Las Vegas Strip", "Hoover Dam", "Bypass Bridge", "Arizona Scenic Overlook", "Joshua Tree Forest", "Grand Canyon West", "Grand Canyon South", "Flagstaff")
+    },
+    {
+        "name": "Day 3: Sedona to Phoenix",
+        "color": "#FF9800", # Orange
+        "points": ("Flagstaff", "Sedona", "Cathedral Rock", "Chapel of Holy Cross", "Bell Rock", "Phoenix Downtown")
+    },
+    {
+        "name": "Day 4: Phoenix & Departure",
+        "color": "#4CAF50", # Green
+        "points": ("Phoenix Downtown", "St. Thomas Orthodox Church", "Phoenix Airport")
+    },
+)
+
 # Image URLs (Configured for GitHub hosting)
 # TODO: Replace 'your-username/your-repo' with your actual repository path
 GITHUB_BASE_URL = "https://raw.githubusercontent.com/rejipmathew27/Phx_tripplanner/main/images"
 
-IMAGES = {
-    "PHX": f"{GITHUB_BASE_URL}/phoenix_airport.jpg",
-    "Hoover Dam": f"{GITHUB_BASE_URL}/hoover_dam.jpg",
-    "Hoover Bridge": f"{GITHUB_BASE_URL}/hoover_bridge.jpg",
-    "Vegas": f"{GITHUB_BASE_URL}/las_vegas_strip.jpg",
-    "GC West": f"{GITHUB_BASE_URL}/grand_canyon_west.jpg",
-    "BellRock Sedona": f"{GITHUB_BASE_URL}/bell_rock_sedona.jpg",
-    "GC South": f"{GITHUB_BASE_URL}/grand_canyon_south.jpg",
-    "Cathedral Rock": f"{GITHUB_BASE_URL}/cathedral_rock.jpg",
-    "Chapel": f"{GITHUB_BASE_URL}/chapel_holy_cross.jpg",
-    "Church": f"{GITHUB_BASE_URL}/st_thomas_orthodox_church.jpg"
+IMAGE_FILES = {
+    "PHX": "phoenix_airport.jpg",
+    "Hoover Dam": "hoover_dam.jpg",
+    "Hoover Bridge": "hoover_bridge.jpg",
+    "Vegas": "las_vegas_strip.jpg",
+    "GC West": "grand_canyon_west.jpg",
+    "BellRock Sedona": "bell_rock_sedona.jpg",
+    "GC South": "grand_canyon_south.jpg",
+    "Cathedral Rock": "cathedral_rock.jpg",
+    "Chapel": "chapel_holy_cross.jpg",
+    "Church": "st_thomas_orthodox_church.jpg"
 }
 
+IMAGES = {key: f"{GITHUB_BASE_URL}/{filename}" for key, filename in IMAGE_FILES.items()}
+
+# The same photos ship with the app, next to this script
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Itinerary card HTML for each day, in trip order
+DAY_CARDS = (
+    # Day 1
+    """
+    <div class="itinerary-card">
+        <h4>🛫 Morning: Arrival & Drive</h4>
+        <ul>
+            <li>Start at <b>Phoenix Sky Harbor (PHX)</b>.</li>
+            <li>Take Route 93 North towards Las Vegas (The Joshua Tree Highway).</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🚧 Mid-Day: Engineering Marvels</h4>
+        <ul>
+            <li>Stop at <b>Henderson</b> for lunch.</li>
+            <li><b>Option A:</b> Visit <b>Hoover Dam</b> directly.</li>
+            <li><b>Option B:</b> Take the Bypass Bridge for the view.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🎰 Evening: The Strip & Trams</h4>
+        <ul>
+            <li>Start walking from <b>3745 Las Vegas Blvd S</b>.</li>
+            <li>Ride the <b>Mandalay Bay Tram</b>.</li>
+            <li>Take the <b>Aria Express Tram</b>.</li>
+            <li>Dinner and Bellagio Fountains.</li>
+        </ul>
+    </div>
+    """,
+    # Day 2
+    """
+    <div class="itinerary-card">
+        <h4>🚗 Morning: Vegas to West Rim (The Scenic Drive)</h4>
+        <ul>
+            <li><b>1. Hoover Dam & Bypass Bridge</b> (40 min from Vegas):
+                <ul>
+                    <li>Walk across the dam or the <b>Mike O’Callaghan–Pat Tillman Memorial Bridge</b> for breathtaking views.</li>
+                    <li>Allow 30–60 mins to explore.</li>
+                </ul>
+            </li>
+            <li><b>2. Arizona Welcome Center / Scenic Views</b>:
+                <ul>
+                    <li>Just across the bridge, pull over at the <b>Arizona Scenic Overlook</b> for photos of the Colorado River.</li>
+                </ul>
+            </li>
+            <li><b>3. Joshua Tree Forest Parkway</b>:
+                <ul>
+                    <li>Diamond Bar Road takes you through a unique high-desert <b>Joshua tree forest</b>.</li>
+                    <li>Pull over safely for photos of these twisted trees.</li>
+                </ul>
+            </li>
+            <li>Arrive at <b>Grand Canyon West</b> (Skywalk).</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🌲 Afternoon: South Rim</h4>
+        <ul>
+            <li>Long drive East to <b>Grand Canyon South Rim</b>.</li>
+            <li>Visit Mather Point and Yavapai Geology Museum.</li>
+            <li>Sunset at Hopi Point.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🛌 Evening: Flagstaff</h4>
+        <ul>
+            <li>Drive South to <b>Flagstaff, AZ</b>.</li>
+            <li>Dinner in historic downtown.</li>
+        </ul>
+    </div>
+    """,
+    # Day 3
+    """
+    <div class="itinerary-card">
+        <h4>⛰️ Morning: The Vortexes</h4>
+        <ul>
+            <li>Drive Hwy 89A (Scenic Switchbacks).</li>
+            <li>Hike or view <b>Cathedral Rock</b>.</li>
+            <li>Visit <b>Bell Rock</b>.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>⛪ Afternoon: Architecture & Views</h4>
+        <ul>
+            <li>Visit <b>Chapel of the Holy Cross</b>.</li>
+            <li>Lunch at Tlaquepaque Arts & Shopping Village.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🏙️ Evening: Drive to Phoenix</h4>
+        <ul>
+            <li>Drive South on I-17 to <b>Phoenix</b>.</li>
+            <li>Check into hotel.</li>
+        </ul>
+    </div>
+    """,
+    # Day 4
+    """
+    <div class="itinerary-card">
+        <h4>☕ Morning: Phoenix</h4>
+        <ul>
+            <li>Wake up in Phoenix.</li>
+            <li>Breakfast in the city.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>⛪ Mid-Day: St. Thomas Orthodox Church</h4>
+        <ul>
+            <li>Head to <b>2317 E Yale St, Phoenix, AZ 85006</b>.</li>
+            <li>Visit St. Thomas Orthodox Church.</li>
+        </ul>
+    </div>
+
+    <div class="itinerary-card">
+        <h4>🛫 Afternoon: Departure</h4>
+        <ul>
+            <li>Short drive to <b>Phoenix Sky Harbor (PHX)</b>.</li>
+            <li>Return Rental Car & Fly Out.</li>
+        </ul>
+    </div>
+    """,
+)
+
+# Simple WMO code mapping: weather code -> (condition, icon) for every code 0-99
+WMO_CODES = {
+    **dict.fromkeys(range(100), ("Sunny", "☀️")),
+    **dict.fromkeys((1, 2, 3), ("Partly Cloudy", "⛅")),
+    **dict.fromkeys((45, 48), ("Foggy", "🌫️")),
+    **dict.fromkeys((51, 53, 55, 61, 63, 65), ("Rainy", "🌧️")),
+    **dict.fromkeys((71, 73, 75), ("Snow", "❄️")),
+    **dict.fromkeys(range(95, 100), ("Stormy", "⚡")),
+}
+
+# Itinerary days, in trip order; offset_days counts from the start date
+DAY_META = [
+    {
+        "title": "Day 1: Phoenix to Las Vegas ({date})",
+        "weather_place": "Las Vegas", "weather_lat": 36.1147, "weather_lon": -115.1728,
+        "offset_days": 0,
+        "markdown": DAY_CARDS[0],
+        "images": (("PHX", "Phoenix Sky Harbor"), ("Hoover Dam", "Hoover Dam"), ("Vegas", "Las Vegas Strip")),
+    },
+    {
+        "title": "Day 2: The Grand Loop ({date})",
+        "weather_place": "Grand Canyon", "weather_lat": 36.0544, "weather_lon": -112.1401,
+        "offset_days": 1,
+        "markdown": DAY_CARDS[1],
+        "images": (("Hoover Bridge", "Hoover Bridge"), ("GC West", "Skywalk at West Rim"), ("GC South", "South Rim Views")),
+    },
+    {
+        "title": "Day 3: Sedona & Return to Phoenix ({date})",
+        "weather_place": "Sedona", "weather_lat": 34.8697, "weather_lon": -111.7610,
+        "offset_days": 2,
+        "markdown": DAY_CARDS[2],
+        "images": (("BellRock Sedona", "Bell Rock Mount Sedona"), ("Cathedral Rock", "Cathedral Rock"), ("Chapel", "Chapel of the Holy Cross")),
+    },
+    {
+        "title": "Day 4: Church & Departure ({date})",
+        "weather_place": "Phoenix", "weather_lat": 33.4484, "weather_lon": -112.0740,
+        "offset_days": 3,
+        "markdown": DAY_CARDS[3],
+        "images": (("Church", "St. Thomas Orthodox Church"), ("PHX", "Phoenix Sky Harbor")),
+    },
+]
+
+# Weather lookup point for each trip day
+WEATHER_LOCATIONS = tuple((day["weather_lat"], day["weather_lon"]) for day in DAY_META)
+
+# Days around today that Open-Meteo's forecast endpoint serves (92 past, 16
+# ahead), each shrunk by one day so server vs. local time zone can't push a
+# request out of range
+FORECAST_PAST_DAYS = 91
+FORECAST_FUTURE_DAYS = 14
+
 # ---------------------------------------------------------
 # HELPER FUNCTIONS
 # ---------------------------------------------------------
 
-def get_weather(lat, lon, date):
+@st.cache_resource
+def get_session():
     """
-    Fetches weather data from Open-Meteo API.
-    Uses 'forecast' endpoint if date is within range, otherwise fallback.
+    Creates one pooled HTTP session for the whole server process.
+    Streamlit re-runs this script on every interaction, so a plain
+    module-level Session would be rebuilt (and its connections dropped)
+    each time; cache_resource keeps keep-alive connections warm.
     """
-    try:
-        date_str = date.strftime('%Y-%m-%d')
-        
-        # Determine if we need forecast or historical (simplified logic)
-        # Open-Meteo Forecast is good for current/near future
-        url = "https://api.open-meteo.com/v1/forecast"
-        
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": ["temperature_2m_max", "temperature_2m_min", "weathercode"],
-            "temperature_unit": "fahrenheit", # Added Fahrenheit unit
-            "timezone": "auto",
-            "start_date": date_str,
-            "end_date": date_str
-        }
-        
-        response = requests.get(url, params=params)
-        data = response.json()
-        
-        if "daily" in data:
-            t_max = data["daily"]["temperature_2m_max"][0]
-            t_min = data["daily"]["temperature_2m_min"][0]
-            code = data["daily"]["weathercode"][0]
-            
-            # Simple WMO code mapping
-            condition = "Sunny"
-            icon = "☀️"
-            if code in [1, 2, 3]: condition, icon = "Partly Cloudy", "qw⛅"
-            elif code in [45, 48]: condition, icon = "Foggy", "🌫️"
-            elif code in [51, 53, 55, 61, 63, 65]: condition, icon = "Rainy", "🌧️"
-            elif code in [71, 73, 75]: condition, icon = "Snow", "❄️"
-            elif code >= 95: condition, icon = "Stormy", "⚡"
-            
-            return f"{icon} {condition} | H: {t_max}°F L: {t_min}°F"
-        else:
-            return "Weather unavailable (Date out of range)"
-    except Exception as e:
-        return "Weather service offline"
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+SESSION = get_session()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_weather_batch(locations, start_date_str, end_date_str):
+    """
+    Fetches weather for several locations over a date range in a single
+    Open-Meteo request. Dates are 'YYYY-MM-DD' strings.
+    Returns a dict of (lat, lon, date_str) -> weather summary string.
+    Network errors and HTTP error replies (429, 5xx, ...) are raised, not
+    returned, so st.cache_data never stores a failure and the next run
+    simply tries again.
+    """
+    # Coordinates are rounded to 2 decimals (the forecast grid is coarser)
+    url = "https://api.open-meteo.com/v1/forecast"
+    
+    params = {
+        "latitude": ",".join(f"{lat:.2f}" for lat, _ in locations),
+        "longitude": ",".join(f"{lon:.2f}" for _, lon in locations),
+        "daily": ["temperature_2m_max", "temperature_2m_min", "weathercode"],
+        "temperature_unit": "fahrenheit", # Added Fahrenheit unit
+        "timezone": "auto",
+        "start_date": start_date_str,
+        "end_date": end_date_str
+    }
+    
+    response = SESSION.get(url, params=params, timeout=(2, 5)) # (connect, read) seconds
+    response.raise_for_status()
+    data = response.json()
+    
+    # One location comes back as an object, several as a list
+    if isinstance(data, dict):
+        data = [data]
+    
+    weather = {}
+    for (lat, lon), forecast in zip(locations, data):
+        daily = forecast["daily"]
+        for date_str, t_max, t_min, code in zip(daily["time"], daily["temperature_2m_max"],
+                                                daily["temperature_2m_min"], daily["weathercode"]):
+            # Days near the end of the forecast range can come back as nulls;
+            # leave them out so the page shows "unavailable" instead
+            if t_max is None or t_min is None or code is None:
+                continue
+            condition, icon = WMO_CODES.get(code, WMO_CODES[0])
+            weather[(lat, lon, date_str)] = f"{icon} {condition} | H: {t_max}°F L: {t_min}°F"
+    return weather
+
+@st.cache_data(show_spinner=False)
+def load_image(filename):
+    """
+    Reads an itinerary photo from the local images/ folder, once per process.
+    Raises OSError if the file is missing, so nothing is cached for it.
+    """
+    with open(os.path.join(IMAGES_DIR, filename), "rb") as f:
+        return f.read()
 
 def create_map(day_selection, show_all=False):
     """Creates a Leafmap based on the selected day."""
     
     # Initialize Leafmap (folium backend)
     # Center map roughly between Phoenix and Vegas
-    m = leafmap.Map(center=[34.5, -112.5], zoom=7)
+    # prefer_canvas draws all vector layers on one <canvas> instead of SVG nodes
+    m = leafmap.Map(center=[34.5, -112.5], zoom=7, prefer_canvas=True)
     
     # Add a cleaner basemap style to match previous aesthetic
     m.add_basemap("CartoDB.Positron")
 
-    routes = []
-    
-    # Define route segments
-    if show_all or day_selection == "Day 1":
-        routes.append({
-            "name": "Day 1: PHX to Vegas",
-            "color": "#E91E63", # Pink
-            "points": ["Phoenix Airport", "Route 93", "Henderson", "Hoover Dam", "Las Vegas Strip"]
-        })
-    
-    if show_all or day_selection == "Day 2":
-        routes.append({
-            "name": "Day 2: Vegas to Flagstaff",
-            "color": "#9C27B0", # Purple
-            "points": ["Las Vegas Strip", "Hoover Dam", "Bypass Bridge", "Arizona Scenic Overlook", "Joshua Tree Forest", "Grand Canyon West", "Grand Canyon South", "Flagstaff"]
-        })
-        
-    if show_all or day_selection == "Day 3":
-        routes.append({
-            "name": "Day 3: Sedona to Phoenix",
-            "color": "#FF9800", # Orange
-            "points": ["Flagstaff", "Sedona", "Cathedral Rock", "Chapel of Holy Cross", "Bell Rock", "Phoenix Downtown"]
-        })
-
-    if show_all or day_selection == "Day 4":
-        routes.append({
-            "name": "Day 4: Phoenix & Departure",
-            "color": "#4CAF50", # Green
-            "points": ["Phoenix Downtown", "St. Thomas Orthodox Church", "Phoenix Airport"]
-        })
+    # Route segments: all of them for the overview, otherwise just the selected day
+    routes = ROUTES if show_all else (ROUTES[int(day_selection[-1]) - 1],)
 
     # Draw Lines and Markers
-    # Since leafmap inherits from folium.Map, we can still use folium markers for custom styling
+    # Since leafmap inherits from folium.Map, we can still use folium layers for custom styling
+    # Days share their endpoints, so every marker goes once into a shared "Stops"
+    # group; hiding one day in the layer control never hides another day's stops
+    stops = folium.FeatureGroup(name="Stops")
+    seen = set()
     for route in routes:
-        line_coords = []
-        for point_name in route["points"]:
-            loc_data = LOCATIONS[point_name]
-            lat, lon = loc_data["coords"]
-            line_coords.append([lat, lon])
-            
-            # Icons based on type
-            icon_color = "gray"
-            icon_icon = "info-sign"
-            
-            if loc_data["type"] == "start": icon_color, icon_icon = "green", "plane"
-            elif loc_data["type"] == "stop": icon_color, icon_icon = "blue", "bed"
-            elif loc_data["type"] == "highlight": icon_color, icon_icon = "red", "camera"
+        # One layer group per route line, so the layer control can toggle a day
+        fg = folium.FeatureGroup(name=route["name"])
+        idxs = [LOCATION_INDEX[p] for p in route["points"]]
+        # One slice of the coordinate array gives the whole polyline
+        line_coords = LOCATION_COORDS[idxs].tolist()
+        
+        for idx, (lat, lon) in zip(idxs, line_coords):
+            point_name = LOCATION_NAMES[idx]
+            if point_name in seen:
+                continue
+            seen.add(point_name)
+            style = MARKER_STYLES.get(LOCATION_TYPES[idx], MARKER_STYLES["waypoint"])
             
-            # Use Folium's marker for specific icon support, adding to leafmap object
-            folium.Marker(
+            # CircleMarkers are vector layers, much lighter than icon Markers
+            folium.CircleMarker(
                 [lat, lon],
                 popup=point_name,
                 tooltip=point_name,
-                icon=folium.Icon(color=icon_color, icon=icon_icon, prefix='fa', icon_color='white')
-            ).add_to(m)
+                **style
+            ).add_to(stops)
         
         folium.PolyLine(
             line_coords,
@@ -202,10 +428,44 @@ def create_map(day_selection, show_all=False):
             weight=4,
             opacity=0.8,
             tooltip=route["name"]
-        ).add_to(m)
+        ).add_to(fg)
+        
+        fg.add_to(m)
+
+    # Added after the routes so markers draw on top of the lines
+    stops.add_to(m)
 
     return m
 
+@st.cache_data(show_spinner=False)
+def get_map_html(view_mode):
+    """
+    Renders the map for a view to a static HTML string.
+    The map only depends on static route data, so each of the five views
+    is built once per server process and then served as cached HTML.
+    """
+    m = create_map(view_mode, show_all=(view_mode == "Overview"))
+    # to_streamlit() adds this on every call; do it once before rendering
+    m.add_layer_control()
+    return m.to_html()
+
+def render_day(day, date_str, date_label, weather, expanded=True):
+    """Renders one itinerary day: forecast line, cards and photos."""
+    with st.expander(day["title"].format(date=date_label), expanded=expanded):
+        forecast = weather.get((day["weather_lat"], day["weather_lon"], date_str), "Weather unavailable (Date out of range)")
+        st.markdown(f"**Weather Forecast ({day['weather_place']}):** `{forecast}`")
+        
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            st.markdown(day["markdown"], unsafe_allow_html=True)
+        with c2:
+            for image_key, caption in day["images"]:
+                try:
+                    image = load_image(IMAGE_FILES[image_key])
+                except OSError:
+                    image = IMAGES[image_key] # Let the browser load the GitHub copy
+                st.image(image, caption=caption, use_container_width=True)
+
 # ---------------------------------------------------------
 # APP UI
 # ---------------------------------------------------------
@@ -231,192 +491,60 @@ with st.sidebar:
 st.title("🌵 Southwest Road Trip Planner")
 st.caption("Phoenix • Las Vegas • Grand Canyon • Sedona")
 
-# Dates for each day
-day_1_date = start_date
-day_2_date = start_date + timedelta(days=1)
-day_3_date = start_date + timedelta(days=2)
-day_4_date = start_date + timedelta(days=3)
-
-# Map Section
-st.markdown("### 📍 Interactive Route Map")
-map_obj = create_map(view_mode, show_all=(view_mode == "Overview"))
-# Use leafmap's to_streamlit method
-map_obj.to_streamlit(height=500)
+# Dates and expander labels for each day, only recomputed when the start date changes
+if st.session_state.get("trip_start") != start_date:
+    st.session_state["trip_start"] = start_date
+    st.session_state["trip_dates"] = [start_date + timedelta(days=i) for i in range(4)]
+    st.session_state["trip_date_strs"] = [d.strftime('%Y-%m-%d') for d in st.session_state["trip_dates"]]
+    st.session_state["trip_labels"] = [d.strftime('%b %d') for d in st.session_state["trip_dates"]]
+trip_dates = st.session_state["trip_dates"]
+date_strs = st.session_state["trip_date_strs"]
+day_labels = st.session_state["trip_labels"]
+
+# Only ask for the part of the trip Open-Meteo can answer; one out-of-range
+# day would otherwise fail the whole request. Days left out show "unavailable".
+today = datetime.now().date()
+weather_from = max(trip_dates[0], today - timedelta(days=FORECAST_PAST_DAYS))
+weather_to = min(trip_dates[-1], today + timedelta(days=FORECAST_FUTURE_DAYS))
+
+# The map only depends on the view, so reruns that keep the view reuse the
+# HTML from session_state. Weather is requested on every run: it is a cache
+# hit until get_weather_batch's TTL expires, so forecasts refresh hourly and
+# failures are retried. The request runs in the background while the map is
+# built and sent to the browser; only the itinerary waits for it.
+with ThreadPoolExecutor(max_workers=1) as executor:
+    weather_future = None
+    if weather_from <= weather_to:
+        weather_future = executor.submit(get_weather_batch, WEATHER_LOCATIONS,
+                                         weather_from.strftime('%Y-%m-%d'), weather_to.strftime('%Y-%m-%d'))
+    if st.session_state.get("map_view") != view_mode:
+        st.session_state["map_html"] = get_map_html(view_mode)
+        st.session_state["map_view"] = view_mode
+
+    # Map Section
+    st.markdown("### 📍 Interactive Route Map")
+    # One-way render of the pre-built HTML (what leafmap's to_streamlit does)
+    components.html(st.session_state["map_html"], height=500)
+
+    weather = {}
+    if weather_future is not None:
+        try:
+            weather = weather_future.result()
+        except (requests.RequestException, ValueError):
+            # Shown for this run only; nothing is cached, so the next run retries
+            weather = {(lat, lon, d): "Weather service offline" for lat, lon in WEATHER_LOCATIONS for d in date_strs}
 
 # Itinerary Section
 st.markdown("### 🗓️ Detailed Itinerary")
 
-# Day 1
-if view_mode in ["Overview", "Day 1"]:
-    with st.expander(f"Day 1: Phoenix to Las Vegas ({day_1_date.strftime('%b %d')})", expanded=True):
-        weather = get_weather(36.1147, -115.1728, day_1_date) # Weather for Vegas
-        st.markdown(f"**Weather Forecast (Las Vegas):** `{weather}`")
-        
-        c1, c2 = st.columns([2, 1])
-        with c1:
-            st.markdown("""
-            <div class="itinerary-card">
-                <h4>🛫 Morning: Arrival & Drive</h4>
-                <ul>
-                    <li>Start at <b>Phoenix Sky Harbor (PHX)</b>.</li>
-                    <li>Take Route 93 North towards Las Vegas (The Joshua Tree Highway).</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>🚧 Mid-Day: Engineering Marvels</h4>
-                <ul>
-                    <li>Stop at <b>Henderson</b> for lunch.</li>
-                    <li><b>Option A:</b> Visit <b>Hoover Dam</b> directly.</li>
-                    <li><b>Option B:</b> Take the Bypass Bridge for the view.</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>🎰 Evening: The Strip & Trams</h4>
-                <ul>
-                    <li>Start walking from <b>3745 Las Vegas Blvd S</b>.</li>
-                    <li>Ride the <b>Mandalay Bay Tram</b>.</li>
-                    <li>Take the <b>Aria Express Tram</b>.</li>
-                    <li>Dinner and Bellagio Fountains.</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        with c2:
-            st.image(IMAGES["PHX"], caption="Phoenix Sky Harbor", use_container_width=True)
-            st.image(IMAGES["Hoover Dam"], caption="Hoover Dam", use_container_width=True)
-            st.image(IMAGES["Vegas"], caption="Las Vegas Strip", use_container_width=True)
-
-# Day 2
-if view_mode in ["Overview", "Day 2"]:
-    with st.expander(f"Day 2: The Grand Loop ({day_2_date.strftime('%b %d')})", expanded=True):
-        weather = get_weather(36.0544, -112.1401, day_2_date) # Weather for GC South
-        st.markdown(f"**Weather Forecast (Grand Canyon):** `{weather}`")
-        
-        c1, c2 = st.columns([2, 1])
-        with c1:
-            st.markdown("""
-            <div class="itinerary-card">
-                <h4>🚗 Morning: Vegas to West Rim (The Scenic Drive)</h4>
-                <ul>
-                    <li><b>1. Hoover Dam & Bypass Bridge</b> (40 min from Vegas):
-                        <ul>
-                            <li>Walk across the dam or the <b>Mike O’Callaghan–Pat Tillman Memorial Bridge</b> for breathtaking views.</li>
-                            <li>Allow 30–60 mins to explore.</li>
-                        </ul>
-                    </li>
-                    <li><b>2. Arizona Welcome Center / Scenic Views</b>:
-                        <ul>
-                            <li>Just across the bridge, pull over at the <b>Arizona Scenic Overlook</b> for photos of the Colorado River.</li>
-                        </ul>
-                    </li>
-                    <li><b>3. Joshua Tree Forest Parkway</b>:
-                        <ul>
-                            <li>Diamond Bar Road takes you through a unique high-desert <b>Joshua tree forest</b>.</li>
-                            <li>Pull over safely for photos of these twisted trees.</li>
-                        </ul>
-                    </li>
-                    <li>Arrive at <b>Grand Canyon West</b> (Skywalk).</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>🌲 Afternoon: South Rim</h4>
-                <ul>
-                    <li>Long drive East to <b>Grand Canyon South Rim</b>.</li>
-                    <li>Visit Mather Point and Yavapai Geology Museum.</li>
-                    <li>Sunset at Hopi Point.</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>🛌 Evening: Flagstaff</h4>
-                <ul>
-                    <li>Drive South to <b>Flagstaff, AZ</b>.</li>
-                    <li>Dinner in historic downtown.</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        with c2:
-            st.image(IMAGES["Hoover Bridge"], caption="Hoover Bridge", use_container_width=True)
-            st.image(IMAGES["GC West"], caption="Skywalk at West Rim", use_container_width=True)
-            st.image(IMAGES["GC South"], caption="South Rim Views", use_container_width=True)
-
-# Day 3
-if view_mode in ["Overview", "Day 3"]:
-    with st.expander(f"Day 3: Sedona & Return to Phoenix ({day_3_date.strftime('%b %d')})", expanded=True):
-        weather = get_weather(34.8697, -111.7610, day_3_date) # Weather for Sedona
-        st.markdown(f"**Weather Forecast (Sedona):** `{weather}`")
-        
-        c1, c2 = st.columns([2, 1])
-        with c1:
-            st.markdown("""
-            <div class="itinerary-card">
-                <h4>⛰️ Morning: The Vortexes</h4>
-                <ul>
-                    <li>Drive Hwy 89A (Scenic Switchbacks).</li>
-                    <li>Hike or view <b>Cathedral Rock</b>.</li>
-                    <li>Visit <b>Bell Rock</b>.</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>⛪ Afternoon: Architecture & Views</h4>
-                <ul>
-                    <li>Visit <b>Chapel of the Holy Cross</b>.</li>
-                    <li>Lunch at Tlaquepaque Arts & Shopping Village.</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>🏙️ Evening: Drive to Phoenix</h4>
-                <ul>
-                    <li>Drive South on I-17 to <b>Phoenix</b>.</li>
-                    <li>Check into hotel.</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        with c2:
-            st.image(IMAGES["BellRock Sedona"], caption="Bell Rock Mount Sedona", use_container_width=True)
-            st.image(IMAGES["Cathedral Rock"], caption="Cathedral Rock", use_container_width=True)
-            st.image(IMAGES["Chapel"], caption="Chapel of the Holy Cross", use_container_width=True)
-
-# Day 4
-if view_mode in ["Overview", "Day 4"]:
-    with st.expander(f"Day 4: Church & Departure ({day_4_date.strftime('%b %d')})", expanded=True):
-        weather = get_weather(33.4484, -112.0740, day_4_date) # Weather for Phoenix
-        st.markdown(f"**Weather Forecast (Phoenix):** `{weather}`")
-        
-        c1, c2 = st.columns([2, 1])
-        with c1:
-            st.markdown("""
-            <div class="itinerary-card">
-                <h4>☕ Morning: Phoenix</h4>
-                <ul>
-                    <li>Wake up in Phoenix.</li>
-                    <li>Breakfast in the city.</li>
-                </ul>
-            </div>
-            
-            <div class="itinerary-card">
-                <h4>⛪ Mid-Day: St. Thomas Orthodox Church</h4>
-                <ul>
-                    <li>Head to <b>2317 E Yale St, Phoenix, AZ 85006</b>.</li>
-                    <li>Visit St. Thomas Orthodox Church.</li>
-                </ul>
-            </div>
-
-            <div class="itinerary-card">
-                <h4>🛫 Afternoon: Departure</h4>
-                <ul>
-                    <li>Short drive to <b>Phoenix Sky Harbor (PHX)</b>.</li>
-                    <li>Return Rental Car & Fly Out.</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        with c2:
-            st.image(IMAGES["Church"], caption="St. Thomas Orthodox Church", use_container_width=True)
-            st.image(IMAGES["PHX"], caption="Phoenix Sky Harbor", use_container_width=True)
+# One expander per day; Overview lists all of them but only opens the first to
+# keep the page short. This is layout only: collapsed days are still rendered
+# and sent to the browser in full.
+for i, day in enumerate(DAY_META):
+    if view_mode in ("Overview", f"Day {i + 1}"):
+        offset = day["offset_days"]
+        render_day(day, date_strs[offset], day_labels[offset], weather,
+                   expanded=(view_mode != "Overview" or i == 0))
 
 # ---------------------------------------------------------
 # EXPORT